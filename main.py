@@ -0,0 +1,592 @@
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Request,
+    UploadFile,
+)
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    ORJSONResponse,
+    Response,
+)
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List, Optional, Dict
+from uuid import uuid4
+from functools import partial
+from secrets import token_hex
+import asyncio
+import contextlib
+import copy
+import hashlib
+import os
+import json
+import threading
+from pathlib import Path
+
+import aiofiles
+import anyio.to_thread
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+import cloudinary
+import cloudinary.uploader
+
+CLOUD_NAME = os.environ.get("CLOUDINARY_CLOUDNAME")
+API_KEY = os.environ.get("CLOUDINARY_APIKEY")
+API_SECRET = os.environ.get("CLOUDINARY_APISECRET")
+USE_CLOUDINARY = all([CLOUD_NAME, API_KEY, API_SECRET])
+
+if USE_CLOUDINARY:
+    cloudinary.config(
+        cloud_name=CLOUD_NAME,
+        api_key=API_KEY,
+        api_secret=API_SECRET,
+        secure=True,
+    )
+
+BASE_DIR = Path(__file__).parent
+UPLOADS_DIR = BASE_DIR / "uploads"
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "123456")
+
+
+def verify_token(authorization: str = Header(None)):
+    expected = f"Bearer {ADMIN_TOKEN}"
+    if authorization != expected:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+MAX_VIDEO_BYTES = 200 * 1024 * 1024
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+def check_size(max_bytes: int):
+    """Dependencia que rechaza subidas por Content-Length antes de leerlas."""
+
+    def _check(content_length: int = Header(..., alias="content-length")):
+        if content_length > max_bytes:
+            raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+
+    return _check
+
+
+# Extensiones aceptadas para guardar en disco local.
+ALLOWED_SUFFIXES = frozenset(
+    {".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp4", ".webm", ".mov"}
+)
+
+
+# O_TMPFILE solo existe en Linux; en otros sistemas se usa aiofiles.
+_HAS_O_TMPFILE = hasattr(os, "O_TMPFILE")
+
+
+async def _try_save_tmpfile(file: UploadFile, out_path: Path) -> bool:
+    """Camino rápido Linux: escribe vía O_TMPFILE y enlaza el nombre final
+    solo al completarse. Devuelve False si el filesystem no lo soporta:
+    el open puede fallar, pero también el linkat final aunque el open
+    haya funcionado (EXDEV/EOPNOTSUPP en overlayfs, el driver por defecto
+    de Docker).
+    """
+    try:
+        fd = os.open(str(UPLOADS_DIR), os.O_TMPFILE | os.O_WRONLY, 0o644)
+    except OSError:
+        return False
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(os.write, fd, chunk)
+        # linkat: el archivo aparece con su nombre solo si se completó.
+        try:
+            await run_in_threadpool(os.link, f"/proc/self/fd/{fd}", str(out_path))
+        except OSError:
+            return False
+        return True
+    finally:
+        os.close(fd)
+
+
+async def _save_upload_local(file: UploadFile) -> tuple[str, str]:
+    """Copia el archivo subido a UPLOADS_DIR en bloques de 1 MiB.
+
+    Devuelve (fname, url) sin cargar el archivo completo en memoria. El
+    nombre se genera con token_hex y solo conserva la extensión (validada
+    contra una whitelist), nunca el nombre que envía el cliente. En Linux
+    intenta primero O_TMPFILE + linkat (sin archivos a medias tras un
+    crash) y, si el filesystem no lo soporta, rebobina y reescribe por el
+    camino clásico con aiofiles.
+    """
+    suffix = Path(file.filename or "").suffix.lower()[:8]
+    if suffix not in ALLOWED_SUFFIXES:
+        raise HTTPException(status_code=400, detail="Extensión no permitida")
+    fname = token_hex(16) + suffix
+    out_path = UPLOADS_DIR / fname
+
+    if _HAS_O_TMPFILE and await _try_save_tmpfile(file, out_path):
+        return fname, f"/uploads/{fname}"
+
+    # UploadFile se apoya en un SpooledTemporaryFile: se puede rebobinar
+    # aunque el intento con O_TMPFILE ya haya consumido el cuerpo.
+    await file.seek(0)
+    async with aiofiles.open(out_path, "wb") as out:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await out.write(chunk)
+    return fname, f"/uploads/{fname}"
+
+
+def _configure_cloudinary_pool(maxsize: int) -> None:
+    """Amplía el pool de conexiones HTTPS del SDK de Cloudinary.
+
+    El PoolManager por defecto de urllib3 solo mantiene viva una conexión
+    por host, así que con subidas concurrentes cada llamada paga un
+    handshake TLS nuevo. ``_http`` es un atributo privado del SDK: si la
+    versión instalada no lo expone, no se toca nada.
+    """
+    if getattr(cloudinary.uploader, "_http", None) is None:
+        return
+    try:
+        import certifi
+        import urllib3
+
+        cloudinary.uploader._http = urllib3.PoolManager(
+            num_pools=2,
+            maxsize=maxsize,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=certifi.where(),
+        )
+    except Exception:
+        pass
+
+
+# Concurrencia máxima de llamadas al SDK de Cloudinary. El limiter se
+# crea en el arranque (necesita un loop activo); sin él se usa el
+# threadpool por defecto.
+CLOUDINARY_CONCURRENCY = 10
+_CLOUDINARY_LIMITER: Optional["anyio.CapacityLimiter"] = None
+
+
+async def _persist_upload(
+    file: UploadFile, *, folder: str, resource_type: str
+) -> tuple:
+    """Guarda el archivo en Cloudinary o en disco y devuelve (url, public_id)."""
+    if USE_CLOUDINARY:
+        if resource_type == "video":
+            # upload_large sube en bloques de 6 MB en vez de un único
+            # POST que bufferiza el archivo completo.
+            upload_call = partial(
+                cloudinary.uploader.upload_large,
+                file.file,
+                chunk_size=6_000_000,
+                folder=folder,
+                resource_type=resource_type,
+            )
+        else:
+            upload_call = partial(
+                cloudinary.uploader.upload,
+                file.file,
+                folder=folder,
+                resource_type=resource_type,
+            )
+        try:
+            result = await anyio.to_thread.run_sync(
+                upload_call, limiter=_CLOUDINARY_LIMITER
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Cloudinary error: {e}")
+        return result.get("secure_url"), result.get("public_id")
+    _, url = await _save_upload_local(file)
+    return url, None
+
+
+CONTENT_PATH = BASE_DIR / "content.json"
+LOCK = threading.Lock()
+
+# Snapshot inmutable del contenido parseado, publicado como una sola
+# referencia (data, mtime). Los escritores lo reemplazan bajo LOCK; los
+# lectores lo leen sin lock (la asignación es atómica bajo el GIL).
+_SNAPSHOT: Optional[tuple] = None
+
+# Respuestas ya serializadas de /api/content y /api/gallery como tuplas
+# (bytes, mtime, etag), válidas mientras el mtime coincida con el del
+# snapshot.
+_CONTENT_RESP: Optional[tuple] = None
+_GALLERY_RESP: Optional[tuple] = None
+
+
+def _etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+# Índice id -> posición en la lista de galería para borrar en O(1).
+_GALLERY_INDEX: Dict[str, int] = {}
+
+# Write-back: las mutaciones solo actualizan el snapshot y marcan _DIRTY;
+# una tarea de fondo vuelca a disco cada FLUSH_INTERVAL segundos.
+_DIRTY = False
+_FLUSHER_TASK: Optional[asyncio.Task] = None
+FLUSH_INTERVAL = 0.2
+
+
+def _rebuild_gallery_index(gallery: list) -> None:
+    global _GALLERY_INDEX
+    _GALLERY_INDEX = {item["id"]: i for i, item in enumerate(gallery)}
+
+DEFAULT_CONTENT = {
+    "heroVideo": None,
+    "slots": {
+        "servicio_1": None,
+        "servicio_2": None,
+        "servicio_3": None,
+        "servicio_4": None,
+        "about_img": None,
+        "team_group": None,
+        "staff_1": None,
+        "staff_2": None,
+        "staff_3": None,
+        "staff_4": None,
+        "staff_5": None,
+        "staff_6": None,
+    },
+    "gallery": [],
+}
+
+VALID_SLOTS = frozenset(DEFAULT_CONTENT["slots"])
+VALID_CATEGORIES = frozenset({"damas", "caballeros", "ninos", "manicura", "pedicura"})
+
+# Plantilla de merge para slots: los valores guardados pisan los defaults.
+_SLOT_TEMPLATE = DEFAULT_CONTENT["slots"]
+
+
+def load_content() -> dict:
+    global _SNAPSHOT
+    snap = _SNAPSHOT  # lectura sin lock del snapshot publicado
+    if snap is not None and _DIRTY:
+        # La memoria va por delante del disco: el snapshot es la verdad.
+        return copy.deepcopy(snap[0])
+    if not CONTENT_PATH.exists():
+        save_content(DEFAULT_CONTENT)
+        return copy.deepcopy(DEFAULT_CONTENT)
+    st = CONTENT_PATH.stat()
+    snap = _SNAPSHOT
+    if snap is not None and snap[1] == st.st_mtime:
+        return copy.deepcopy(snap[0])
+    # Snapshot frío: parsear fuera del lock y publicar el resultado al final.
+    try:
+        raw = CONTENT_PATH.read_bytes()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except Exception:
+        data = DEFAULT_CONTENT
+    data["slots"] = {**_SLOT_TEMPLATE, **(data.get("slots") or {})}
+    data.setdefault("gallery", [])
+    data.setdefault("heroVideo", None)
+    with LOCK:
+        if _DIRTY and _SNAPSHOT is not None:
+            # Una mutación se publicó mientras parseábamos: ese snapshot es
+            # la verdad y lo leído del disco ya está viejo. No publicarlo.
+            snap = _SNAPSHOT
+        else:
+            _SNAPSHOT = (data, st.st_mtime)
+            _rebuild_gallery_index(data["gallery"])
+            snap = None
+    if snap is not None:
+        return copy.deepcopy(snap[0])
+    return copy.deepcopy(data)
+
+
+def _write_content_file(payload: bytes) -> None:
+    """Escritura atómica y durable: tmp + fsync + os.replace."""
+    tmp = CONTENT_PATH.with_suffix(".json.tmp")
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CONTENT_PATH)
+
+
+def save_content(data: dict):
+    """Publica el nuevo snapshot; el volcado a disco lo hace el flusher."""
+    global _SNAPSHOT, _CONTENT_RESP, _GALLERY_RESP, _DIRTY
+    with LOCK:
+        _SNAPSHOT = (data, _SNAPSHOT[1] if _SNAPSHOT is not None else 0.0)
+        _CONTENT_RESP = None
+        _GALLERY_RESP = None
+        _rebuild_gallery_index(data.get("gallery", []))
+        _DIRTY = True
+
+
+def _flush_content() -> None:
+    """Vuelca el snapshot sucio a disco (corre en el threadpool)."""
+    global _SNAPSHOT, _DIRTY
+    with LOCK:
+        if not _DIRTY or _SNAPSHOT is None:
+            return
+        data = _SNAPSHOT[0]
+        _DIRTY = False
+    # Sin indentación: el archivo lo consume la máquina, no una persona.
+    if orjson is not None:
+        payload = orjson.dumps(data)
+    else:
+        payload = json.dumps(
+            data, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    _write_content_file(payload)
+    with LOCK:
+        if not _DIRTY:
+            # Nadie mutó durante la escritura: re-sincroniza el mtime.
+            _SNAPSHOT = (data, CONTENT_PATH.stat().st_mtime)
+
+
+class GalleryItem(BaseModel):
+    id: str
+    url: str
+    public_id: Optional[str] = None
+    category: str
+
+
+class ContentResponse(BaseModel):
+    heroVideo: Optional[str] = None
+    slots: Dict[str, Optional[str]]
+    gallery: List[GalleryItem]
+
+
+app = FastAPI(
+    title="The Secret Spot API",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
+
+
+@app.on_event("startup")
+async def _setup_cloudinary():
+    global _CLOUDINARY_LIMITER
+    if USE_CLOUDINARY:
+        # Limiter propio para el SDK: acota las subidas sin tocar el
+        # threadpool por defecto que comparten el resto de endpoints.
+        _CLOUDINARY_LIMITER = anyio.CapacityLimiter(CLOUDINARY_CONCURRENCY)
+        _configure_cloudinary_pool(maxsize=CLOUDINARY_CONCURRENCY)
+
+
+@app.on_event("startup")
+async def _start_flusher():
+    global _FLUSHER_TASK
+
+    async def _flusher():
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            if _DIRTY:
+                await run_in_threadpool(_flush_content)
+
+    _FLUSHER_TASK = asyncio.create_task(_flusher())
+
+
+@app.on_event("shutdown")
+async def _stop_flusher():
+    if _FLUSHER_TASK is not None:
+        _FLUSHER_TASK.cancel()
+        # Esperar a que termine: si estaba volcando en el threadpool, ese
+        # hilo sigue vivo tras cancel() y no debe solaparse con el volcado
+        # final sobre el mismo archivo temporal.
+        with contextlib.suppress(asyncio.CancelledError):
+            await _FLUSHER_TASK
+    # Último volcado para no perder la mutación más reciente.
+    await run_in_threadpool(_flush_content)
+
+
+@app.get("/panel", response_class=HTMLResponse)
+def serve_panel():
+    panel_path = BASE_DIR / "panel.html"
+    if not panel_path.exists():
+        return HTMLResponse("<h1>Panel no encontrado</h1>")
+    # FileResponse sirve el archivo vía sendfile, sin copiarlo a Python.
+    return FileResponse(panel_path, media_type="text/html")
+
+
+@app.get("/api/content", response_model=ContentResponse)
+def get_content(request: Request):
+    """Devuelve TODO el contenido editable."""
+    global _CONTENT_RESP
+    cached, snap = _CONTENT_RESP, _SNAPSHOT
+    if cached is not None and snap is not None and cached[1] == snap[1]:
+        return _cached_json_response(request, cached[0], cached[2])
+    data = load_content()
+    # El formato guardado ya es el formato de respuesta: model_construct
+    # evita re-validar cada item en el camino caliente.
+    gallery_items = [GalleryItem.model_construct(**item) for item in data["gallery"]]
+    resp = ContentResponse.model_construct(
+        heroVideo=data.get("heroVideo"),
+        slots=data["slots"],
+        gallery=gallery_items,
+    )
+    body = _dumps(resp.model_dump())
+    etag = _etag_for(body)
+    snap = _SNAPSHOT
+    with LOCK:
+        _CONTENT_RESP = (body, snap[1] if snap is not None else 0.0, etag)
+    return _cached_json_response(request, body, etag)
+
+
+@app.post("/api/hero-video")
+async def upload_hero_video(
+    file: UploadFile = File(...),
+    token: str = Depends(verify_token),
+    _size_ok: None = Depends(check_size(MAX_VIDEO_BYTES)),
+):
+    if not file:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    url, _ = await _persist_upload(
+        file, folder="thesecretspot/hero", resource_type="video"
+    )
+
+    data = load_content()
+    data["heroVideo"] = url
+    save_content(data)
+    return {"message": "Hero video actualizado", "url": url}
+
+
+@app.post("/api/slot-image")
+async def upload_slot_image(
+    slot_key: str = Form(...),
+    file: UploadFile = File(...),
+    token: str = Depends(verify_token),
+    _size_ok: None = Depends(check_size(MAX_IMAGE_BYTES)),
+):
+    if slot_key not in VALID_SLOTS:
+        raise HTTPException(status_code=400, detail="slot_key inválido")
+
+    url, _ = await _persist_upload(
+        file, folder="thesecretspot/slots", resource_type="image"
+    )
+
+    data = load_content()
+    data["slots"][slot_key] = url
+    save_content(data)
+    return {"message": "Imagen de sección actualizada", "url": url}
+
+
+@app.get("/api/gallery", response_model=List[GalleryItem])
+def get_gallery(request: Request):
+    global _GALLERY_RESP
+    cached, snap = _GALLERY_RESP, _SNAPSHOT
+    if cached is not None and snap is not None and cached[1] == snap[1]:
+        return _cached_json_response(request, cached[0], cached[2])
+    data = load_content()
+    items = [GalleryItem.model_construct(**item) for item in data["gallery"]]
+    body = _dumps([item.model_dump() for item in items])
+    etag = _etag_for(body)
+    snap = _SNAPSHOT
+    with LOCK:
+        _GALLERY_RESP = (body, snap[1] if snap is not None else 0.0, etag)
+    return _cached_json_response(request, body, etag)
+
+
+@app.post("/api/gallery")
+async def upload_gallery_image(
+    category: str = Form(...),
+    file: UploadFile = File(...),
+    token: str = Depends(verify_token),
+    _size_ok: None = Depends(check_size(MAX_IMAGE_BYTES)),
+):
+    if category not in VALID_CATEGORIES:
+        raise HTTPException(status_code=400, detail="Categoría inválida")
+
+    url, public_id = await _persist_upload(
+        file, folder=f"thesecretspot/gallery/{category}", resource_type="image"
+    )
+
+    item = {
+        "id": uuid4().hex,
+        "url": url,
+        "public_id": public_id,
+        "category": category,
+    }
+    data = load_content()
+    data["gallery"].append(item)
+    save_content(data)
+    return {"message": "Imagen añadida a galería", "item": item}
+
+
+def _destroy_cloudinary(public_id: str) -> None:
+    try:
+        cloudinary.uploader.destroy(public_id)
+    except Exception:
+        pass
+
+
+def _unlink_quiet(path: Path) -> None:
+    try:
+        path.unlink()
+    except Exception:
+        pass
+
+
+@app.delete("/api/gallery/{item_id}")
+async def delete_gallery_image(
+    item_id: str,
+    background_tasks: BackgroundTasks,
+    token: str = Depends(verify_token),
+):
+    data = load_content()
+    gallery = data["gallery"]
+    idx = _GALLERY_INDEX.get(item_id)
+    if idx is None or idx >= len(gallery) or gallery[idx]["id"] != item_id:
+        # Índice desfasado (edición externa del archivo): escaneo lineal.
+        idx = next((i for i, it in enumerate(gallery) if it["id"] == item_id), None)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+
+    item = gallery[idx]
+    del gallery[idx]
+    save_content(data)
+
+    # El borrado remoto/local no condiciona la respuesta: va en background
+    # (las tareas síncronas corren en el threadpool de Starlette).
+    if item.get("public_id") and USE_CLOUDINARY:
+        background_tasks.add_task(_destroy_cloudinary, item["public_id"])
+    elif item["url"].startswith("/uploads/"):
+        local_path = UPLOADS_DIR / item["url"].split("/uploads/")[-1]
+        background_tasks.add_task(_unlink_quiet, local_path)
+
+    return {"message": "Imagen eliminada"}